@@ -9,41 +9,102 @@ Features:
 - Video generation plan-aware limits & Fame Booster
 - Logging & reporting
 - FAQ endpoint
-- Single-file deployment with auto-install
+- Single-file deployment (dependencies in requirements.txt)
 """
 
 import os
-import sys
-import subprocess
-import json
-import requests
-from fastapi import FastAPI, Request, HTTPException, Header
-from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional
+from importlib.metadata import version, PackageNotFoundError
+import asyncio
+import logging
+import itertools
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Literal, Optional
+from dataclasses import dataclass
+from types import MappingProxyType
 
 # -----------------------------
-# Auto-install required packages
+# Required packages
 # -----------------------------
+# Installed from requirements.txt at build time. Only the distributions this
+# module imports unconditionally are checked here; Firebase, Redis and the
+# uvicorn/gunicorn runners are optional and degrade or fail where they are used.
 REQUIRED = [
     "fastapi",
-    "uvicorn",
-    "requests",
-    "stripe",
-    "python-dotenv",
     "pydantic",
-    "firebase-admin",
+    "email-validator",
+    "orjson",
+    "cachetools",
 ]
 for pkg in REQUIRED:
     try:
-        __import__(pkg)
-    except ImportError:
-        subprocess.check_call([sys.executable, "-m", "pip", "install", pkg])
+        version(pkg)
+    except PackageNotFoundError:
+        raise RuntimeError(f"Missing dependency {pkg}; install it with pip install -r requirements.txt")
+
+import orjson
+from cachetools import TTLCache
+from fastapi import FastAPI, Request, HTTPException, Header, Depends
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, ConfigDict, EmailStr
+
+logger = logging.getLogger("kairah")
 
 # -----------------------------
 # FastAPI app
 # -----------------------------
-app = FastAPI(title="Kairah Studio Backend")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if USE_REDIS:
+        flusher = asyncio.create_task(commission_flusher())
+    yield
+    if USE_REDIS:
+        flusher.cancel()
+        try:
+            await flusher
+        except asyncio.CancelledError:
+            pass
+        await flush_commissions()
+
+app = FastAPI(title="Kairah Studio Backend", lifespan=lifespan)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+# Reject oversized bodies: up front from Content-Length, otherwise by counting
+# bytes as they are received (chunked uploads). Plain ASGI, so responses are
+# not re-streamed. Registered before CORS so the 413 still carries CORS headers.
+MAX_BODY_BYTES = 256 * 1024
+
+class BodySizeLimitMiddleware:
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                if value.isdigit() and int(value) > self.max_bytes:
+                    response = JSONResponse(status_code=413, content={"detail": "Payload too large"})
+                    return await response(scope, receive, send)
+                break
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail="Payload too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+app.add_middleware(BodySizeLimitMiddleware, max_bytes=MAX_BODY_BYTES)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -55,46 +116,105 @@ app.add_middleware(
 # -----------------------------
 # Environment / API keys
 # -----------------------------
-STRIPE_SECRET_KEY = "sk_test_yourstripekey"
-STRIPE_WEBHOOK_SECRET = "whsec_123456"
-PAYSTACK_SECRET_KEY = "sk_test_paystackkey"
-PAYSTACK_WEBHOOK_SECRET = "paystack_webhook_secret"
-MPESA_CONSUMER_KEY = "mpesa_key"
-MPESA_CONSUMER_SECRET = "mpesa_secret"
-MPESA_SHORTCODE = "mpesa_shortcode"
-MPESA_PASSKEY = "mpesa_passkey"
-MPESA_CALLBACK_URL = "https://yourdomain.com/api/mpesa-webhook"
-PAYPAL_CLIENT_ID = "paypal_client_id"
-PAYPAL_SECRET = "paypal_secret"
-WISE_ACCOUNT_NUMBER = "12345678"
-WISE_ROUTING_NUMBER = "020123456"
-WISE_ACCOUNT_NAME = "Kairah"
-VIDEO_API_URL = "https://yourvideoapi.com/generate"
-VIDEO_API_KEY = "your_video_api_key"
-FIREBASE_SERVICE_ACCOUNT_JSON = "your_firebase_service_account_json"
-PORT = 8000
-FAME_BOOSTER_PRICE = 9
-
-# stripe.api_key = STRIPE_SECRET_KEY  # Removed since Stripe is no longer used
+@dataclass(frozen=True, slots=True)
+class Config:
+    stripe_secret_key: str
+    stripe_webhook_secret: str
+    paystack_secret_key: str
+    paystack_webhook_secret: str
+    mpesa_consumer_key: str
+    mpesa_consumer_secret: str
+    mpesa_shortcode: str
+    mpesa_passkey: str
+    mpesa_callback_url: str
+    paypal_client_id: str
+    paypal_secret: str
+    wise_account_number: str
+    wise_routing_number: str
+    wise_account_name: str
+    video_api_url: str
+    video_api_key: str
+    firebase_service_account_json: str
+    redis_url: str
+    port: int
+    web_concurrency: int
+    limit_concurrency: int
+    fame_booster_price: int
+
+CFG = Config(
+    stripe_secret_key=os.getenv("STRIPE_SECRET_KEY", "sk_test_yourstripekey"),
+    stripe_webhook_secret=os.getenv("STRIPE_WEBHOOK_SECRET", "whsec_123456"),
+    paystack_secret_key=os.getenv("PAYSTACK_SECRET_KEY", "sk_test_paystackkey"),
+    paystack_webhook_secret=os.getenv("PAYSTACK_WEBHOOK_SECRET", "paystack_webhook_secret"),
+    mpesa_consumer_key=os.getenv("MPESA_CONSUMER_KEY", "mpesa_key"),
+    mpesa_consumer_secret=os.getenv("MPESA_CONSUMER_SECRET", "mpesa_secret"),
+    mpesa_shortcode=os.getenv("MPESA_SHORTCODE", "mpesa_shortcode"),
+    mpesa_passkey=os.getenv("MPESA_PASSKEY", "mpesa_passkey"),
+    mpesa_callback_url=os.getenv("MPESA_CALLBACK_URL", "https://yourdomain.com/api/mpesa-webhook"),
+    paypal_client_id=os.getenv("PAYPAL_CLIENT_ID", "paypal_client_id"),
+    paypal_secret=os.getenv("PAYPAL_SECRET", "paypal_secret"),
+    wise_account_number=os.getenv("WISE_ACCOUNT_NUMBER", "12345678"),
+    wise_routing_number=os.getenv("WISE_ROUTING_NUMBER", "020123456"),
+    wise_account_name=os.getenv("WISE_ACCOUNT_NAME", "Kairah"),
+    video_api_url=os.getenv("VIDEO_API_URL", "https://yourvideoapi.com/generate"),
+    video_api_key=os.getenv("VIDEO_API_KEY", "your_video_api_key"),
+    firebase_service_account_json=os.getenv("FIREBASE_SERVICE_ACCOUNT_JSON", "your_firebase_service_account_json"),
+    redis_url=os.getenv("REDIS_URL", ""),
+    port=int(os.getenv("PORT", "8000")),
+    web_concurrency=int(os.getenv("WEB_CONCURRENCY", "1")),
+    limit_concurrency=int(os.getenv("LIMIT_CONCURRENCY", "1000")),
+    fame_booster_price=int(os.getenv("FAME_BOOSTER_PRICE", "9")),
+)
 
 
 # -----------------------------
 # Firebase init
 # -----------------------------
-USE_FIREBASE = False
+# The SDK is initialised on the first user lookup rather than at import, and
+# its blocking calls run in the default threadpool.
+USE_FIREBASE = bool(CFG.firebase_service_account_json)
+firebase_auth = None
+_firebase_lock = asyncio.Lock()
+
+def _init_firebase():
+    import firebase_admin
+    from firebase_admin import credentials, auth
+    try:
+        sa = orjson.loads(CFG.firebase_service_account_json)
+        cred = credentials.Certificate(sa)
+    except Exception:
+        cred = credentials.Certificate(CFG.firebase_service_account_json)
+    firebase_admin.initialize_app(cred)
+    return auth
+
+async def ensure_firebase():
+    global USE_FIREBASE, firebase_auth
+    if firebase_auth is None and USE_FIREBASE:
+        async with _firebase_lock:
+            if firebase_auth is None and USE_FIREBASE:
+                try:
+                    firebase_auth = await asyncio.to_thread(_init_firebase)
+                except Exception:
+                    USE_FIREBASE = False
+    return USE_FIREBASE
+
+# -----------------------------
+# Redis init
+# -----------------------------
+USE_REDIS = False
+redis_client = None
 try:
-    if FIREBASE_SERVICE_ACCOUNT_JSON:
-        import firebase_admin
-        from firebase_admin import credentials, auth
-        try:
-            sa = json.loads(FIREBASE_SERVICE_ACCOUNT_JSON)
-            cred = credentials.Certificate(sa)
-        except Exception:
-            cred = credentials.Certificate(FIREBASE_SERVICE_ACCOUNT_JSON)
-        firebase_admin.initialize_app(cred)
-        USE_FIREBASE = True
+    if CFG.redis_url:
+        import redis.asyncio as aioredis
+        redis_client = aioredis.from_url(CFG.redis_url, decode_responses=True)
+        USE_REDIS = True
 except Exception:
-    USE_FIREBASE = False
+    USE_REDIS = False
+
+# Without Redis each worker keeps its own in-memory tables, so users created in
+# one process are invisible to the others.
+if CFG.web_concurrency > 1 and not USE_REDIS:
+    logger.warning("WEB_CONCURRENCY=%d without REDIS_URL: each worker has its own in-memory state", CFG.web_concurrency)
 
 # -----------------------------
 # In-memory DBs
@@ -103,135 +223,305 @@ users_db = {}
 affiliates_db = {}
 videos_db = {}
 payments_db = {}
+LOCAL_DBS = {"users": users_db, "affiliates": affiliates_db, "videos": videos_db, "payments": payments_db}
 
 # -----------------------------
 # Plan definitions
 # -----------------------------
-PLANS = {
+_PLAN_DEFS = {
     "Free": {"price_month": 0, "price_year": 0, "video_limit": 1, "length_sec": 6},
     "Pro": {"price_month": 19, "price_year": 300, "video_limit": 10, "length_sec": 60},
     "Diamond": {"price_month": 49, "price_year": 450, "video_limit": None, "length_sec": 180},
     "Cinematic": {"price_month": 99, "price_year": 600, "video_limit": None, "length_sec": 300},
     "Lifetime": {"price_one_time": 500, "video_limit": None, "length_sec": None},
 }
+# Read-only all the way down: both the plan table and each plan's fields.
+PLANS = MappingProxyType({name: MappingProxyType(dict(plan)) for name, plan in _PLAN_DEFS.items()})
+VALID_PLANS = frozenset(PLANS)
+PLAN_LENGTH_SEC = MappingProxyType({name: plan["length_sec"] for name, plan in PLANS.items()})
 
 # -----------------------------
 # Models
 # -----------------------------
 class SignupRequest(BaseModel):
-    email: str
+    model_config = ConfigDict(extra="ignore")
+    email: EmailStr
     display_name: Optional[str]
     referral_code: Optional[str]
 
 class LoginRequest(BaseModel):
-    email: str
+    model_config = ConfigDict(extra="ignore")
+    email: EmailStr
 
 class VideoRequest(BaseModel):
-    user_email: str
+    model_config = ConfigDict(extra="ignore")
+    user_email: EmailStr
     prompt: str
-    aspect_ratio: Optional[str] = "16:9"
+    aspect_ratio: Optional[Literal["16:9", "9:16", "1:1"]] = "16:9"
     fame_booster: Optional[bool] = False
 
+# -----------------------------
+# Storage
+# -----------------------------
+# Each table is a Redis hash of JSON values when Redis is configured, so every
+# worker sees the same state; otherwise the in-memory dicts above are used.
+async def db_get(table: str, key: str):
+    if USE_REDIS:
+        raw = await redis_client.hget(table, key)
+        return orjson.loads(raw) if raw else None
+    return LOCAL_DBS[table].get(key)
+
+async def db_set(table: str, key: str, value: dict):
+    if USE_REDIS:
+        await redis_client.hset(table, key, orjson.dumps(value))
+    else:
+        LOCAL_DBS[table][key] = value
+    return value
+
+async def db_insert(table: str, key: str, value: dict):
+    # Returns False when the key already exists (HSETNX / setdefault), so
+    # concurrent creates of the same key have exactly one winner.
+    if USE_REDIS:
+        return bool(await redis_client.hsetnx(table, key, orjson.dumps(value)))
+    return LOCAL_DBS[table].setdefault(key, value) is value
+
+# Sets one field of a JSON record server-side, so the write only touches
+# that key instead of WATCHing (and retrying on) the whole table hash.
+_SET_FIELD_LUA = """
+local raw = redis.call('HGET', KEYS[1], ARGV[1])
+local rec = raw and cjson.decode(raw) or cjson.decode(ARGV[4])
+rec[ARGV[2]] = cjson.decode(ARGV[3])
+raw = cjson.encode(rec)
+redis.call('HSET', KEYS[1], ARGV[1], raw)
+return raw
+"""
+_set_field_script = redis_client.register_script(_SET_FIELD_LUA) if USE_REDIS else None
+
+async def db_set_field(table: str, key: str, field: str, value, default: dict):
+    if USE_REDIS:
+        raw = await _set_field_script(keys=[table], args=[key, field, orjson.dumps(value), orjson.dumps(default)], client=redis_client)
+        return orjson.loads(raw)
+    record = LOCAL_DBS[table].setdefault(key, default)
+    record[field] = value
+    return record
+
+_video_seq = itertools.count(1)
+
+async def next_video_seq():
+    if USE_REDIS:
+        return await redis_client.incr("videos:seq")
+    return next(_video_seq)
+
+# Referrals are a Redis list per affiliate so concurrent signups append
+# atomically instead of rewriting the affiliate record.
+def _referrals_key(ref_code: str):
+    return f"affiliate:{ref_code}:referred"
+
+async def add_referral(ref_code: str, email: str):
+    if USE_REDIS:
+        if await redis_client.hexists("affiliates", ref_code) or await redis_client.hexists("affiliate_commission", ref_code):
+            await redis_client.rpush(_referrals_key(ref_code), email)
+        return
+    aff = affiliates_db.get(ref_code)
+    if aff:
+        aff.setdefault("referred", []).append(email)
+
+async def get_referrals(ref_code: str):
+    if USE_REDIS:
+        return await redis_client.lrange(_referrals_key(ref_code), 0, -1)
+    aff = affiliates_db.get(ref_code)
+    return aff.get("referred", []) if aff else []
+
 # -----------------------------
 # Helpers
 # -----------------------------
 from datetime import datetime
 
-def get_user(email: str):
-    if USE_FIREBASE:
+USER_CACHE_TTL = 300
+
+def _user_cache_key(email: str):
+    return f"user:{email}"
+
+# email -> uid is stable, so Firebase hits are memoized per process (and in
+# Redis when configured) to skip the RPC on repeat lookups.
+_firebase_users = TTLCache(maxsize=10_000, ttl=USER_CACHE_TTL)
+
+# Only Firebase lookups are cached (they never change with local writes);
+# local users are read straight from the users table.
+async def firebase_user(email: str):
+    user = _firebase_users.get(email)
+    if user:
+        return user
+    if USE_REDIS:
+        cached = await redis_client.get(_user_cache_key(email))
+        if cached:
+            user = _firebase_users[email] = orjson.loads(cached)
+            return user
+    u = await asyncio.to_thread(firebase_auth.get_user_by_email, email)
+    user = _firebase_users[email] = {"email": u.email, "uid": u.uid, "plan": "Free"}
+    if USE_REDIS:
+        await redis_client.set(_user_cache_key(email), orjson.dumps(user), ex=USER_CACHE_TTL)
+    return user
+
+async def get_user(email: str):
+    if await ensure_firebase():
         try:
-            u = auth.get_user_by_email(email)
-            return {"email": u.email, "uid": u.uid, "plan": "Free"}
+            return await firebase_user(email)
         except Exception:
-            return users_db.get(email)
-    return users_db.get(email)
+            return await db_get("users", email)
+    return await db_get("users", email)
 
-def create_user_local(email: str, display_name=None, referral_code=None):
-    users_db[email] = {"email": email, "display_name": display_name or "", "plan": "Free", "ref": referral_code}
+async def create_user_local(email: str, display_name=None, referral_code=None):
+    # Returns None if the user already exists; the referral is only recorded
+    # for the request that actually created the user.
+    user = {"email": email, "display_name": display_name or "", "plan": "Free", "ref": referral_code}
+    if not await db_insert("users", email, user):
+        return None
     if referral_code:
-        aff = affiliates_db.get(referral_code)
-        if aff:
-            aff.setdefault("referred", []).append(email)
-    return users_db[email]
-
-def upgrade_user_plan(email: str, plan: str):
-    u = users_db.get(email)
-    if u:
-        u["plan"] = plan
-    else:
-        users_db[email] = {"email": email, "plan": plan}
-    return users_db[email]
+        await add_referral(referral_code, email)
+    return user
 
-def record_payment(payment_id: str, email: str, method: str, amount: float, status="pending"):
-    payments_db[payment_id] = {"email": email, "method": method, "amount": amount, "status": status, "timestamp": str(datetime.now())}
-    return payments_db[payment_id]
+async def upgrade_user_plan(email: str, plan: str):
+    if plan not in VALID_PLANS:
+        raise ValueError(f"Unknown plan: {plan}")
+    return await db_set_field("users", email, "plan", plan, {"email": email})
 
-def credit_affiliate(email: str, amount: float):
-    user = users_db.get(email)
-    if not user or not user.get("ref"):
+async def record_payment(payment_id: str, email: str, method: str, amount: float, status="pending"):
+    return await db_set("payments", payment_id, {"email": email, "method": method, "amount": amount, "status": status, "timestamp": str(datetime.now())})
+
+# With Redis, commissions accumulate here and are flushed with one
+# HINCRBYFLOAT per affiliate, so a burst of sales becomes a single pipeline.
+COMMISSION_FLUSH_SEC = 0.25
+_commission_buf = defaultdict(float)
+
+async def credit_affiliate(email: str, amount: float):
+    user = await db_get("users", email)
+    ref_code = user and user.get("ref")
+    if not ref_code:
         return 0
-    ref_code = user["ref"]
-    aff = affiliates_db.setdefault(ref_code, {"commission": 0, "referred": []})
     commission = amount * 0.7  # 70% to affiliate
-    aff["commission"] += commission
+    if USE_REDIS:
+        _commission_buf[ref_code] += commission
+    else:
+        aff = affiliates_db.setdefault(ref_code, {"commission": 0, "referred": []})
+        aff["commission"] += commission
     return commission
 
+async def affiliate_commission(ref_code: str):
+    if USE_REDIS:
+        return float(await redis_client.hget("affiliate_commission", ref_code) or 0)
+    aff = affiliates_db.get(ref_code)
+    return aff.get("commission", 0) if aff else 0
+
+async def flush_commissions():
+    global _commission_buf
+    if not _commission_buf:
+        return
+    buf, _commission_buf = _commission_buf, defaultdict(float)
+    pipe = redis_client.pipeline()
+    for ref_code, delta in buf.items():
+        pipe.hincrbyfloat("affiliate_commission", ref_code, delta)
+    try:
+        await pipe.execute()
+    except BaseException:
+        # Put the batch back so it is retried on the next flush.
+        for ref_code, delta in buf.items():
+            _commission_buf[ref_code] += delta
+        raise
+
+async def commission_flusher():
+    while True:
+        await asyncio.sleep(COMMISSION_FLUSH_SEC)
+        try:
+            await flush_commissions()
+        except Exception:
+            logger.exception("Commission flush failed; retrying")
+
 # -----------------------------
 # Routes
 # -----------------------------
+INDEX_RESPONSE = orjson.dumps({"message": "Kairah Studio Backend live!"})
+
 @app.get("/")
 async def index():
-    return {"message": "Kairah Studio Backend live!"}
+    return Response(INDEX_RESPONSE, media_type="application/json")
 
 @app.post("/api/signup")
-async def signup(req: SignupRequest):
-    if get_user(req.email):
+async def signup(req: SignupRequest) -> dict:
+    if await get_user(req.email):
+        raise HTTPException(status_code=400, detail="User exists")
+    user = await create_user_local(req.email, req.display_name, req.referral_code)
+    if user is None:
         raise HTTPException(status_code=400, detail="User exists")
-    user = create_user_local(req.email, req.display_name, req.referral_code)
     return {"message": "User created", "user": user}
 
 @app.post("/api/login")
-async def login(req: LoginRequest):
-    user = get_user(req.email)
+async def login(req: LoginRequest) -> dict:
+    user = await get_user(req.email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return {"message": "Login success", "user": user}
 
-@app.post("/api/generate-video")
-async def generate_video(req: VideoRequest):
-    user = get_user(req.user_email)
+# The body is declared only here, so FastAPI validates it once.
+async def current_video_user(req: VideoRequest):
+    user = await get_user(req.user_email)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
+    return req, user
+
+@app.post("/api/generate-video")
+async def generate_video(ctx: tuple = Depends(current_video_user)) -> dict:
+    req, user = ctx
     plan = user.get("plan", "Free")
-    limit_sec = PLANS[plan]["length_sec"]
-    video_id = f"{req.user_email.replace('@','_')}_{len(videos_db)+1}"
+    limit_sec = PLAN_LENGTH_SEC[plan]
+    video_id = f"{req.user_email.replace('@', '_', 1)}_{await next_video_seq()}"
     fame_flag = req.fame_booster
     video_url = f"https://cdn.kairahstudio.com/mock_videos/{video_id}.mp4"
-    videos_db[video_id] = {"email": req.user_email, "prompt": req.prompt, "url": video_url, "length": limit_sec, "fame_booster": fame_flag, "aspect_ratio": req.aspect_ratio}
+    await db_set("videos", video_id, {"email": req.user_email, "prompt": req.prompt, "url": video_url, "length": limit_sec, "fame_booster": fame_flag, "aspect_ratio": req.aspect_ratio or "16:9"})
     return {"video_url": video_url, "length_sec": limit_sec, "fame_booster": fame_flag}
 
 # -----------------------------
 # Affiliate Endpoints
 # -----------------------------
 @app.get("/api/affiliate/earnings")
-async def affiliate_earnings(email: str):
-    user = get_user(email)
+async def affiliate_earnings(email: EmailStr) -> dict:
+    user = await get_user(email)
     if not user or not user.get("ref"):
         return {"total":0, "pending":0, "bonus":0}
-    aff = affiliates_db.get(user["ref"], {"commission":0})
-    return {"total": aff.get("commission",0), "pending": 0, "bonus": 0}
+    return {"total": await affiliate_commission(user["ref"]), "pending": 0, "bonus": 0}
 
 @app.get("/api/affiliate/referrals")
-async def affiliate_referrals(email: str):
-    user = get_user(email)
+async def affiliate_referrals(email: EmailStr) -> dict:
+    user = await get_user(email)
     if not user or not user.get("ref"):
         return {"referred": []}
-    aff = affiliates_db.get(user["ref"], {"referred": []})
-    return {"referred": aff.get("referred", [])}
+    return {"referred": await get_referrals(user["ref"])}
+
+# -----------------------------
+# Gunicorn worker
+# -----------------------------
+# Production runs gunicorn with this worker (see Procfile). uvicorn_worker
+# ignores --worker-connections, so the concurrency cap is passed to uvicorn
+# through CONFIG_KWARGS instead.
+try:
+    from uvicorn_worker import UvicornWorker
+
+    class KairahUvicornWorker(UvicornWorker):
+        CONFIG_KWARGS = {**UvicornWorker.CONFIG_KWARGS, "limit_concurrency": CFG.limit_concurrency}
+except ImportError:
+    pass
 
 # -----------------------------
 # Run Uvicorn
 # -----------------------------
+# Local entry point. Past LIMIT_CONCURRENCY open connections uvicorn answers
+# 503 instead of queueing.
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=PORT)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=CFG.port,
+        workers=CFG.web_concurrency,
+        limit_concurrency=CFG.limit_concurrency,
+    )